@@ -95,12 +95,11 @@ def mat_equil(A, n_list, tol, max_iter):
     for k in range(max_iter):
         d1 = N / (A_block.dot(e) + N * gamma * em)
         e1 = m / (A_block_T.dot(d1) + m * gamma * eN)
-        err_d = np.linalg.norm(d1 - d)
-        err_e = np.linalg.norm(e1 - e)
+        # Check the length-N block scaling first, so the length-m norm is skipped while it has not converged.
+        converged = np.linalg.norm(e1 - e)/np.sqrt(N) <= tol and np.linalg.norm(d1 - d)/np.sqrt(m) <= tol
         d = d1
         e = e1
-        # print('k={}, err_d={}, err_e={}'.format(k, err_d/np.sqrt(m), err_e/np.sqrt(N)))
-        if err_d/np.sqrt(m) <= tol and err_e/np.sqrt(N) <= tol:
+        if converged:
             break
     
     d = np.sqrt(d)
@@ -114,7 +114,7 @@ def prox_identity_base(v, t):
 def prox_neg_base(v, t):
 	"""Proximal operator of :math:`f(x) = -\\min(x,0)`, where the minimum is taken elementwise.
 	"""
-	return apply_to_nonzeros(lambda y: np.where(y + t <= 0, y + t, np.where(y >= 0, y, 0)), v)
+	return apply_to_nonzeros(lambda y: np.minimum(y + t, 0) + np.maximum(y, 0), v)
 
 def prox_neg_entr_base(v, t):
 	"""Proximal operator of :math:`f(x) = x\\log(x)`.
@@ -133,4 +133,4 @@ def prox_neg_log_base(v, t):
 def prox_pos_base(v, t):
 	"""Proximal operator of :math:`f(x) = \\max(x,0)`, where the maximum is taken elementwise.
 	"""
-	return apply_to_nonzeros(lambda y: np.where(y - t >= 0, y - t, np.where(y <= 0, y, 0)), v)
+	return apply_to_nonzeros(lambda y: np.maximum(y - t, 0) + np.minimum(y, 0), v)
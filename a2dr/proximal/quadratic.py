@@ -86,6 +86,8 @@ def prox_qp(v, t = 1, Q = None, q = None, F = None, g = None, *args, **kwargs):
         raise ValueError("Dimension mismatch: nrow(F) != nrow(g)")
     if F.shape[1] != v.shape[0]:
         raise ValueError("Dimension mismatch: ncol(F) != nrow(v)")
+    # This canonicalizes a new CVXPY problem on every call. To evaluate the operator repeatedly,
+    # build prox_qp_base(Q, q, F, g) once and reuse it.
     return prox_scale(prox_qp_base(Q, q, F, g), *args, **kwargs)(v, t)
 
 def prox_quad_form_base(v, t, Q, method = "lsqr"):
@@ -139,17 +141,18 @@ def prox_sum_squares_affine_base(v, t, F, g, method = "lsqr"):
         raise ValueError("method must be 'lsqr' or 'lstsq'")
 
 def prox_qp_base(Q, q, F, g):
-    # check warmstart/parameter mode -- make sure the problem reduction is only done once
+    # Parameters enter the problem only affinely (DPP), so the returned closure reduces the problem once
+    # and its subsequent calls reuse the canonicalized data with a warm start.
     n = Q.shape[0]
-    I = np.eye(n)
-    v_par = Parameter(n)
-    t_par = Parameter(nonneg=True)
+    vt_par = Parameter(n)                 # v/t
+    tinv_par = Parameter(nonneg=True)     # 1/(2*t)
     x = Variable(n)
-    obj = quad_form(x, Q) + sum_squares(x)/2/t_par + (q-v_par/t_par)*x
+    obj = quad_form(x, Q) + tinv_par*sum_squares(x) + (q-vt_par)*x
     constr = [F * x <= g]
     prob = Problem(Minimize(obj), constr)
     def prox_qp1(v, t):
-        v_par.value, t_par.value = v, t
-        prob.solve()
+        vt_par.value, tinv_par.value = v/t, 1/(2*t)
+        prob.solve(warm_start=True)
         return x.value
+    prox_qp1.prob = prob
     return prox_qp1
@@ -31,18 +31,23 @@ sys_stdout_origin = sys.stdout
 
 def a2dr_worker(pipe, prox, v_init, A, t, anderson, m_accel):
     # Initialize AA-II parameters.
-    if anderson:   # TODO: Store and update these efficiently as arrays.
-        F_hist = []  # History of F(v^(k)).
+    if anderson:
+        # History of F(v^(k)), stored as the columns of a ring buffer of the m_accel+1 latest iterates.
+        F_hist = np.zeros((v_init.shape[0], m_accel + 1), order='F')
+        F_wts = np.zeros(m_accel + 1)   # AA-II weights scattered onto the ring buffer columns.
+        F_len = F_next = 0   # Number of stored columns and position of the next one.
     v_vec = v_init.copy()
     v_res = np.zeros(v_init.shape[0])
 
+    # Open the null device once to silence the proximal step on every iteration.
+    devnull = open(os.devnull, 'w')
+
     # A2DR loop.
     while True:
         # Proximal step for x^(k+1/2).
         warnings.filterwarnings("ignore")
-        sys.stdout = open(os.devnull, 'w')
+        sys.stdout = devnull
         x_half = prox(v_vec, t)
-        sys.stdout.close()
         sys.stdout = sys_stdout_origin
         warnings.filterwarnings("default")
 
@@ -54,16 +59,18 @@ def a2dr_worker(pipe, prox, v_init, A, t, anderson, m_accel):
         dk, k = pipe.recv()   # dk = A^\dagger(Av^(k+1/2) - b)[i] for node i.
         x_new = v_half - dk
 
-        if anderson and k > 0: # for k = 0, always do the vanilla DRS update
-            m_k = min(m_accel, k)  # Keep F(v^(j)) for iterations (k-m_k) through k.
+        # Compute g^(k) = v^(k) - F(v^(k)) = x^(k+1/2) - x^(k+1) and the DRS update F(v^(k)) once.
+        g_vec = x_half - x_new
+        F_vec = v_vec - g_vec
 
-            # Save history of F(v^(k)).
-            F_hist.append(v_vec + x_new - x_half)
-            if len(F_hist) > m_k + 1:
-                F_hist.pop(0)
+        if anderson and k > 0: # for k = 0, always do the vanilla DRS update
+            # Save history of F(v^(k)), overwriting the oldest column once the buffer is full.
+            F_hist[:,F_next] = F_vec
+            F_next = (F_next + 1) % (m_accel + 1)
+            F_len = min(F_len + 1, m_accel + 1)
 
-            # Send s^(k-1) = v^(k) - v^(k-1) and g^(k) = v^(k) - F(v^(k)) = x^(k+1/2) - x^(k+1).
-            pipe.send((v_res, x_half - x_new))
+            # Send s^(k-1) = v^(k) - v^(k-1) and g^(k).
+            pipe.send((v_res, g_vec))
 
             # Receive safeguarding decision.
             AA_update = pipe.recv()
@@ -71,32 +78,33 @@ def a2dr_worker(pipe, prox, v_init, A, t, anderson, m_accel):
                 # Receive AA-II weights for v^(k+1).
                 alpha = pipe.recv()
 
-                # Weighted update of v^(k+1).
-                v_new = np.column_stack(F_hist).dot(alpha) #.dot(alpha[:(k + 1)]) ### Why truncate to (k+1)???
+                # Weighted update of v^(k+1), with alpha ordered from the oldest to the newest column.
+                F_wts[(F_next - F_len + np.arange(F_len)) % (m_accel + 1)] = alpha
+                v_new = F_hist.dot(F_wts)
             else:
                 # Revert to DRS update of v^(k+1).
-                v_new = v_vec + x_new - x_half
+                v_new = F_vec
 
             # Save v^(k+1) - v^(k) for next iteration.
             v_res = v_new - v_vec
         elif anderson and k == 0: 
-            # Update v^(k+1) = v^(k) + x^(k+1) - x^(k+1/2).
-            v_new = v_vec + x_new - x_half
+            # Update v^(k+1) = F(v^(k)).
+            v_new = F_vec
             ## only useful when anderson = True but k == 0
-            # Store v_res in case anderson = True
-            v_res = v_new - v_vec
+            # Store v_res = v^(k+1) - v^(k) = -g^(k) in case anderson = True
+            v_res = -g_vec
             # Update F_hist in case anderson = True
-            F_hist.append(v_vec + x_new - x_half)
-            # Send g^(k) = v^(k) - F(v^(k)) = x^(k+1/2) - x^(k+1).
-            pipe.send(x_half - x_new)
+            F_hist[:,F_next] = F_vec
+            F_next, F_len = 1, 1
+            # Send g^(k).
+            pipe.send(g_vec)
         else:
-            # Update v^(k+1) = v^(k) + x^(k+1) - x^(k+1/2).
-            v_new = v_vec + x_new - x_half
+            # Update v^(k+1) = F(v^(k)).
+            v_new = F_vec
 
-        # Send x^(k+1/2) along with A*x^(k+1/2) and x^(k+1/2) - v^(k) for computing residuals.
+        # Send x^(k+1/2) along with A*x^(k+1/2) for computing residuals.
         Ax_half = A.dot(x_half)
-        xv_diff = x_half - v_vec
-        pipe.send((x_half, Ax_half, xv_diff))
+        pipe.send((x_half, Ax_half))
         
         v_vec = v_new
 
@@ -226,19 +234,23 @@ def a2dr(p_list, A_list = [], b = np.array([]), v_init = None, n_list = None, *a
         print("eps_safe = {:.2e}, M_safe = {:d}".format(
                eps_safe, M_safe))
 
-    # Store constraint matrix for projection step.
+    # Store constraint matrix for projection step, and its transpose for the dual residual.
     A = sp.csr_matrix(sp.hstack(A_list))
+    A_T = A.T
     if verbose:
         print("variables n = {}, constraints m = {}".format(A.shape[1], A.shape[0]))
         print("nnz(A) = {}".format(A.nnz))
         print("Setup time: {:.2e}".format(time() - start))
 
+    # Open the null device once to silence lsqr on every iteration.
+    devnull = open(os.devnull, 'w')
+
     # Check linear feasibility
-    sys.stdout = open(os.devnull, 'w')
+    sys.stdout = devnull
     r1norm = sp.linalg.lsqr(A, b)[3]
-    sys.stdout.close()
     sys.stdout = sys_stdout_origin
     if r1norm >= np.sqrt(eps_abs): # infeasible
+        devnull.close()
         if verbose:
             print('Infeasible linear equality constraint: minimum constraint violation = {:.2e}'.format(r1norm))
             print('Status: Terminated due to linear infeasibility')
@@ -259,144 +271,167 @@ def a2dr(p_list, A_list = [], b = np.array([]), v_init = None, n_list = None, *a
         procs += [Process(target=a2dr_worker, args=(remote, p_list[i], v_init[i], A_list[i], \
                                                     t_init, anderson, m_accel) + args)]
         procs[-1].start()
-
-    # Initialize AA-II variables.
-    if anderson:   # TODO: Store and update these efficiently as arrays.
-        n_sum = np.sum([np.prod(v.shape) for v in v_init])
-        g_vec = np.zeros(n_sum)   # g^(k) = v^(k) - F(v^(k)).
-        s_hist = []  # History of s^(j) = v^(j+1) - v^(j), kept in S^(k) = [s^(k-m_k) ... s^(k-1)].
-        y_hist = []  # History of y^(j) = g^(j+1) - g^(j), kept in Y^(k) = [y^(k-m_k) ... y^(k-1)].
-        n_AA = M_AA = 0   # Safeguarding counters.
-
-    # A2DR loop.
-    k = 0
-    finished = False
-    safeguard = True
-    r_primal = np.zeros(max_iter)
-    r_dual = np.zeros(max_iter)
-    r_best = np.inf
-
-    # Warm start terms.
-    dk = np.zeros(A.shape[1])
-    sol = np.zeros(A.shape[0])
-
-    while not finished:
-        # Gather v_i^(k+1/2) from nodes.
-        v_halves = [pipe.recv() for pipe in pipes]
-
-        # Projection step for x^(k+1).
-        v_half = np.concatenate(v_halves, axis=0)
-        sys.stdout = open(os.devnull, 'w')
-        dk = sp.linalg.lsqr(A, A.dot(v_half) - b, atol=1e-10, btol=1e-10, x0=dk)[0]
-        sys.stdout.close()
-        sys.stdout = sys_stdout_origin
-
-        # Scatter d^k = A^\dagger(Av^(k+1/2) - b).
-        for i in range(N):
-            pipes[i].send((dk[n_list_cumsum[i]:n_list_cumsum[i+1]], k))
-
-        if anderson and k > 0: # for k = 0, always do the vanilla DRS update
-            m_k = min(m_accel, k)  # Keep (y^(j), s^(j)) for iterations (k-m_k) through (k-1).
-
-            # Gather s_i^(k-1) and g_i^(k) from nodes.
-            sg_update = [pipe.recv() for pipe in pipes]
-            s_new, g_new = map(list, zip(*sg_update))
-            s_new = np.concatenate(s_new, axis=0)   # s_i^(k-1) = v_i^(k) - v_i^(k-1).
-            g_new = np.concatenate(g_new, axis=0)   # g_i^(k) = v_i^(k) - F(v_i^(k)) = x_i^(k+1/2) - x_i^(k+1).
-
-            # Save newest column y^(k-1) = g^(k) - g^(k-1) of matrix Y^(k).
-            y_hist.append(g_new - g_vec)
-            if len(y_hist) > m_k:
-                y_hist.pop(0)
-            g_vec = g_new
-
-            # Save newest column s^(k-1) = v^(k) - v^(k-1) of matrix S^(k).
-            s_hist.append(s_new)
-            if len(s_hist) > m_k:
-                s_hist.pop(0)
-
-            # Safeguard update.
-            if safeguard or M_AA >= M_safe:
-                if LA.norm(g_vec) <= D_safe*g0_norm*(n_AA/M_safe + 1)**(-(1 + eps_safe)):
+        remote.close()   # Only the worker uses this end.
+
+    # Shut down the workers and release their pipes even if the loop raises, so the interpreter does not
+    # hang on them and repeated calls do not accumulate processes.
+    try:
+        # Preallocate contiguous buffers for the blocks gathered from nodes.
+        n_sum = n_list_cumsum[-1]
+        blocks = [slice(n_list_cumsum[i], n_list_cumsum[i+1]) for i in range(N)]   # Index range of node i.
+        v_half = np.empty(n_sum)    # v^(k+1/2) = (v_1^(k+1/2),...,v_N^(k+1/2)).
+        subgrad = np.empty(n_sum)   # (x^(k+1/2) - v^(k))/t.
+        r_primal_vec = np.empty(b.shape[0])   # \sum_i A_i*x_i^(k+1/2) - b.
+
+        # Initialize AA-II variables.
+        if anderson:
+            g_vec = np.zeros(n_sum)   # g^(k) = v^(k) - F(v^(k)).
+            g_new = np.empty(n_sum)   # Receives g^(k+1), then swaps with g_vec.
+            s_new = np.empty(n_sum)   # s^(k) = v^(k+1) - v^(k).
+            # Ring buffer of y^(j) = g^(j+1) - g^(j), with y^(j) stored in column j % m_accel.
+            Y_hist = np.empty((n_sum, m_accel), order='F')
+            # Ring buffer of ||y^(j)||_2^2 + ||s^(j)||_2^2, so ||Y^(k)||_F^2 + ||S^(k)||_F^2 is a running sum.
+            ssq_hist = np.empty(m_accel)
+            Y_next = 0   # Position of the next column, which overwrites the oldest one once the history is full.
+            n_AA = M_AA = 0   # Safeguarding counters.
+
+        # A2DR loop.
+        k = 0
+        finished = False
+        safeguard = True
+        r_primal = np.empty(max_iter)   # Only the first k entries are filled and returned.
+        r_dual = np.empty(max_iter)
+        r_best = np.inf
+
+        # Warm start terms.
+        dk = np.zeros(A.shape[1])
+        sol = np.zeros(A.shape[0])
+
+        while not finished:
+            # Gather v_i^(k+1/2) from nodes.
+            for i in range(N):
+                np.copyto(v_half[blocks[i]], pipes[i].recv())
+
+            # Projection step for x^(k+1).
+            sys.stdout = devnull
+            dk = sp.linalg.lsqr(A, A.dot(v_half) - b, atol=1e-10, btol=1e-10, x0=dk)[0]
+            sys.stdout = sys_stdout_origin
+
+            # Scatter d^k = A^\dagger(Av^(k+1/2) - b).
+            for i in range(N):
+                pipes[i].send((dk[blocks[i]], k))
+
+            if anderson and k > 0: # for k = 0, always do the vanilla DRS update
+                m_k = min(m_accel, k)  # Keep (y^(j), s^(j)) for iterations (k-m_k) through (k-1).
+
+                # Gather s_i^(k-1) = v_i^(k) - v_i^(k-1) and g_i^(k) = x_i^(k+1/2) - x_i^(k+1) from nodes.
+                for i in range(N):
+                    s_new[blocks[i]], g_new[blocks[i]] = pipes[i].recv()
+
+                # Save newest column y^(k-1) = g^(k) - g^(k-1) over the oldest one y^(k-m_accel-1),
+                # then replace g^(k-1) by g^(k).
+                y_new = Y_hist[:,Y_next]
+                np.subtract(g_new, g_vec, out=y_new)
+                g_vec, g_new = g_new, g_vec
+
+                # Save squared norms of y^(k-1) and s^(k-1) in a single pass each.
+                ssq_hist[Y_next] = y_new.dot(y_new) + s_new.dot(s_new)
+                Y_next = (Y_next + 1) % m_accel
+
+                # Safeguard update.
+                if safeguard or M_AA >= M_safe:
+                    if LA.norm(g_vec) <= D_safe*g0_norm*(n_AA/M_safe + 1)**(-(1 + eps_safe)):
+                        AA_update = True
+                        n_AA = n_AA + 1
+                        M_AA = 1
+                        safeguard = False
+                    else:
+                        AA_update = False
+                        M_AA = 0
+                        safeguard = True
+                else:
                     AA_update = True
+                    M_AA = M_AA + 1
                     n_AA = n_AA + 1
-                    M_AA = 1
-                    safeguard = False
-                else:
-                    AA_update = False
-                    M_AA = 0
-                    safeguard = True
-            else:
-                AA_update = True
-                M_AA = M_AA + 1
-                n_AA = n_AA + 1
 
-            # Scatter safeguarding decision.
-            for pipe in pipes:
-                pipe.send(AA_update)
-            if AA_update:
-                # Compute and scatter AA-II weights.
-                Y_mat = np.column_stack(y_hist)
-                S_mat = np.column_stack(s_hist)
-                if ada_reg:
-                    reg = lam_accel * (LA.norm(Y_mat)**2 + LA.norm(S_mat)**2)  # AA-II regularization.
-                else:
-                    reg = lam_accel
-                alpha = aa_weights(Y_mat, g_new, reg, type=aa_method, rcond=None)
+                # Scatter safeguarding decision.
                 for pipe in pipes:
-                    pipe.send(alpha)
+                    pipe.send(AA_update)
+                if AA_update:
+                    # Compute and scatter AA-II weights, with the columns of Y^(k) = [y^(k-m_k) ... y^(k-1)] in order.
+                    Y_mat = Y_hist[:,(Y_next - m_k + np.arange(m_k)) % m_accel]
+                    if ada_reg:
+                        reg = lam_accel * np.sum(ssq_hist[:m_k])  # AA-II regularization.
+                    else:
+                        reg = lam_accel
+                    alpha = aa_weights(Y_mat, g_vec, reg, type=aa_method, rcond=None)
+                    for pipe in pipes:
+                        pipe.send(alpha)
               
-        elif anderson and k == 0:
-            AA_update = False   # Initial step is always DRS.
-            g_new = [pipe.recv() for pipe in pipes]
-            g_vec = np.concatenate(g_new, axis=0)
-            g0_norm = LA.norm(g_vec)
-
-        # Compute l2-norm of primal and dual residuals.
-        r_update = [pipe.recv() for pipe in pipes]
-        x_halves, Ax_halves, xv_diffs = map(list, zip(*r_update))
-        r_primal_vec = sum(Ax_halves) - b
-        r_primal[k] = LA.norm(r_primal_vec, ord=2)
-
-        subgrad = np.concatenate(xv_diffs)/t_init
-        # sol = LA.lstsq(A.T, subgrad, rcond=None)[0]
-        sys.stdout = open(os.devnull, 'w')
-        sol = sp.linalg.lsqr(A.T, subgrad, atol=1e-10, btol=1e-10, x0=sol)[0]
-        sys.stdout.close()
+            elif anderson and k == 0:
+                AA_update = False   # Initial step is always DRS.
+                for i in range(N):
+                    np.copyto(g_vec[blocks[i]], pipes[i].recv())
+                g0_norm = LA.norm(g_vec)
+
+            # Compute l2-norm of primal and dual residuals.
+            x_halves = []
+            np.negative(b, out=r_primal_vec)
+            for i in range(N):
+                x_half, Ax_half = pipes[i].recv()
+                x_halves.append(x_half)
+                r_primal_vec += Ax_half
+                # x_i^(k+1/2) - v_i^(k) = v_i^(k+1/2) - x_i^(k+1/2), so it need not be sent.
+                np.subtract(v_half[blocks[i]], x_half, out=subgrad[blocks[i]])
+            r_primal_ssq = r_primal_vec.dot(r_primal_vec)
+            r_primal[k] = np.sqrt(r_primal_ssq)
+
+            subgrad /= t_init
+            # sol = LA.lstsq(A.T, subgrad, rcond=None)[0]
+            sys.stdout = devnull
+            sol = sp.linalg.lsqr(A_T, subgrad, atol=1e-10, btol=1e-10, x0=sol)[0]
+            sys.stdout = sys_stdout_origin
+            r_dual_vec = A_T.dot(sol)
+            r_dual_vec -= subgrad
+            r_dual_ssq = r_dual_vec.dot(r_dual_vec)
+            r_dual[k] = np.sqrt(r_dual_ssq)
+
+            # Save x_i^(k+1/2) if residual norm is smallest so far.
+            r_all = np.sqrt(r_primal_ssq + r_dual_ssq)
+            if k == 0:   # Store ||r^0||_2 for stopping criterion.
+                r_all_0 = r_all
+            if k == 0 or r_all < r_best:
+                x_final = x_halves
+                r_best = r_all
+                k_best = k
+
+            if (k % 100 == 0 or k == max_iter-1) and verbose:
+                # print every 100 iterations or reaching maximum
+                print("{}| {}  {}  {}  {}".format(str(k).rjust(6), 
+                                            format(r_all, ".2e").ljust(10),
+                                            format(r_primal[k], ".2e").ljust(11), 
+                                            format(r_dual[k], ".2e").ljust(9),
+                                            format(time() - start, ".2e").ljust(8)))
+
+            # Stop when residual norm falls below tolerance.
+            k = k + 1
+            finished = k >= max_iter or (r_all <= eps_abs + eps_rel * r_all_0)
+            if r_all <= eps_abs + eps_rel * r_all_0 and k % 100 != 0 and verbose:
+                # print the best iterate
+                print("{}| {}  {}  {}  {}".format(str(k-1).rjust(6), 
+                                format(r_all, ".2e").ljust(10),
+                                format(r_primal[k-1], ".2e").ljust(11), 
+                                format(r_dual[k-1], ".2e").ljust(9),
+                                format(time() - start, ".2e").ljust(8)))
+    finally:
         sys.stdout = sys_stdout_origin
-        r_dual_vec = A.T.dot(sol) - subgrad
-        r_dual[k] = LA.norm(r_dual_vec, ord=2)
-
-        # Save x_i^(k+1/2) if residual norm is smallest so far.
-        r_all = LA.norm(np.concatenate([r_primal_vec, r_dual_vec]), ord=2)
-        if k == 0:   # Store ||r^0||_2 for stopping criterion.
-            r_all_0 = r_all
-        if k == 0 or r_all < r_best:
-            x_final = x_halves
-            r_best = r_all
-            k_best = k
-
-        if (k % 100 == 0 or k == max_iter-1) and verbose:
-            # print every 100 iterations or reaching maximum
-            print("{}| {}  {}  {}  {}".format(str(k).rjust(6), 
-                                        format(r_all, ".2e").ljust(10),
-                                        format(r_primal[k], ".2e").ljust(11), 
-                                        format(r_dual[k], ".2e").ljust(9),
-                                        format(time() - start, ".2e").ljust(8)))
-
-        # Stop when residual norm falls below tolerance.
-        k = k + 1
-        finished = k >= max_iter or (r_all <= eps_abs + eps_rel * r_all_0)
-        if r_all <= eps_abs + eps_rel * r_all_0 and k % 100 != 0 and verbose:
-            # print the best iterate
-            print("{}| {}  {}  {}  {}".format(str(k-1).rjust(6), 
-                            format(r_all, ".2e").ljust(10),
-                            format(r_primal[k-1], ".2e").ljust(11), 
-                            format(r_dual[k-1], ".2e").ljust(9),
-                            format(time() - start, ".2e").ljust(8)))
+        for proc, pipe in zip(procs, pipes):
+            proc.terminate()
+            proc.join()
+            pipe.close()
+        devnull.close()
 
     # Unscale and return x_i^(k+1/2).
-    [p.terminate() for p in procs]
     if precond and has_constr:
         x_final = [ei*x for x, ei in zip(x_final, e_pre)]
     end = time()
@@ -692,6 +692,26 @@ class TestProximal(BaseTest):
         self.check_composition(lambda v, *args, **kwargs: prox_quad_form(v, Q = Q, method = "lstsq", *args, **kwargs),
                                lambda x: quad_form(x, P = Q), v)
 
+    def test_qp(self):
+        from a2dr.proximal.quadratic import prox_qp_base
+        n = 10
+        m = 5
+        Q = np.random.randn(n,n)
+        Q = Q.T.dot(Q) + 0.5*np.eye(n)
+        q = np.random.randn(n)
+        F = np.random.randn(m,n)
+        g = F.dot(np.random.randn(n)) + np.abs(np.random.randn(m))
+
+        # The problem is built once and only its parameters change between calls.
+        prox = prox_qp_base(Q, q, F, g)
+        self.assertTrue(prox.prob.is_dpp())
+        for t in [self.t, 1.0, 0.1]:
+            v = np.random.randn(n)
+            x_a2dr = prox(v, t)
+            x_cvxpy = self.prox_cvxpy(v, lambda x: quad_form(x, Q) + q*x, constr_fun = lambda x: [F*x <= g], t = t)
+            self.assertItemsAlmostEqual(x_a2dr, x_cvxpy, places = 3)
+            self.assertItemsAlmostEqual(prox_qp(v, t, Q, q, F, g), x_cvxpy, places = 3)
+
     def test_trace(self):
         # Sparsity consistency tests.
         C = sparse.random(*self.C_square_sparse.shape)
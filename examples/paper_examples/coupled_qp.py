@@ -34,6 +34,7 @@ from sklearn.datasets import make_sparse_spd_matrix
 
 from a2dr import a2dr
 from a2dr.proximal import *
+from a2dr.proximal.quadratic import prox_qp_base
 from a2dr.tests.base_test import BaseTest
 
 class TestPaper(BaseTest):
@@ -65,8 +66,9 @@ class TestPaper(BaseTest):
         Q_list = [H_list[l].T.dot(H_list[l]) for l in range(L)]
         
         # Convert problem to standard form.
+        # Build each CVXPY problem once, so every a2dr iteration only updates its parameters.
         def prox_qp_wrapper(l, Q_list, c_list, F_list, d_list):
-            return lambda v, t: prox_qp(v, t, Q_list[l], c_list[l], F_list[l], d_list[l])
+            return prox_qp_base(Q_list[l], c_list[l], F_list[l], d_list[l])
         # Use "map" method to avoid implicit overriding, which would make all the proximal operators the same
         prox_list = list(map(lambda l: prox_qp_wrapper(l, Q_list, c_list, F_list, d_list), range(L)))
         A_list = G_list
@@ -32,6 +32,7 @@ from sklearn.datasets import make_sparse_spd_matrix
 
 from a2dr import a2dr
 from a2dr.proximal import *
+from a2dr.proximal.quadratic import prox_qp_base
 from a2dr.tests.base_test import BaseTest
 
 class TestPaper(BaseTest):
@@ -283,8 +284,9 @@ class TestPaper(BaseTest):
         Q_list = [H_list[l].T.dot(H_list[l]) for l in range(L)]
         
         # Convert problem to standard form.
+        # Build each CVXPY problem once, so every a2dr iteration only updates its parameters.
         def tmp(l, Q_list, c_list, F_list, d_list):
-            return lambda v, t: prox_qp(v, t, Q_list[l], c_list[l], F_list[l], d_list[l])
+            return prox_qp_base(Q_list[l], c_list[l], F_list[l], d_list[l])
         # Use "map" method to avoid implicit overriding, which would make all the proximal operators the same
         prox_list = list(map(lambda l: tmp(l, Q_list, c_list, F_list, d_list), range(L)))
         A_list = G_list
@@ -315,21 +317,18 @@ class TestPaper(BaseTest):
         p = 4000   # Number of sources.
         q = 7000   # Number of flows.
 
-        # Construct a random incidence matrix.
-        B = sparse.lil_matrix((p,q))
-        for i in range(q-p+1):
-            idxs = np.random.choice(p, size=2, replace=False)
-            tmp = np.random.rand()
-            if tmp > 0.5:
-                B[idxs[0],i] = 1
-                B[idxs[1],i] = -1
-            else:
-                B[idxs[0],i] = -1
-                B[idxs[1],i] = 1
-        for j in range(q-p+1,q):
-            B[j-(q-p+1),j] = 1
-            B[j-(q-p),j] = -1 
-        B = sparse.csr_matrix(B)
+        # Construct a random incidence matrix from (row, col, value) triplets.
+        # Flows i < q-p+1 join two distinct random sources with a random orientation.
+        n_rand = q-p+1
+        idx0 = np.random.randint(p, size=n_rand)
+        idx1 = (idx0 + np.random.randint(1, p, size=n_rand)) % p
+        sign = np.where(np.random.rand(n_rand) > 0.5, 1.0, -1.0)
+        # Flows j >= q-p+1 form a chain from source j-(q-p+1) to source j-(q-p).
+        idx = np.arange(q-p+1, q)
+        rows = [idx0, idx1, idx-(q-p+1), idx-(q-p)]
+        cols = [np.arange(n_rand)]*2 + [idx]*2
+        vals = [sign, -sign, np.ones(p-1), -np.ones(p-1)]
+        B = sparse.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(p,q))
         
         # Generate source and flow range data
         s_tilde = np.random.randn(p)
@@ -339,7 +338,8 @@ class TestPaper(BaseTest):
         s_tilde[p2:] = np.sum(np.abs(s_tilde[p1:p2])) / (p-p2)
         L = s_tilde[p1:p2]
         s_max = np.hstack([s_tilde[p2:p3]+0.001, 2*(s_tilde[p3:]+0.001)])
-        res = sparse.linalg.lsqr(B, -s_tilde, atol=1e-16, btol=1e-16)
+        # z_tilde only sets the flow bounds, which get a 1e-3 margin below, so a 1e-10 tolerance is ample.
+        res = sparse.linalg.lsqr(B, -s_tilde, atol=1e-10, btol=1e-10)
         z_tilde = res[0]
         q1 = int(q/2)
         z_max = np.abs(z_tilde)+0.001
@@ -367,11 +367,20 @@ class TestPaper(BaseTest):
         #          + \sum_{i'} I(s_{i'}^{transfer}=0) + \sum_{i''}
         #          + \sum_{i"} I(s_{i"}^{sink}=L_{i"}).
         # A = [B, I], b = 0
-        zeros = np.zeros(p1)
-        def prox_sat(v, t, c, v_lo = -np.inf, v_hi = np.inf):
-            return prox_box_constr(prox_sum_squares(v, t*c), t, v_lo, v_hi)
-        prox_list = [lambda v, t: prox_sat(v, t, c, -z_max, z_max),
-                     lambda v, t: np.hstack([zeros, L, prox_sat(v[p2:], t, d[p2:], 0, s_max)])]
+        def prox_sat(v, t, c, v_lo = -np.inf, v_hi = np.inf, out = None):
+            # prox_box_constr(prox_sum_squares(v, t*c), t, v_lo, v_hi) in one elementwise pass.
+            out = np.divide(v, 1 + 2*t*c, out=out)
+            return np.clip(out, v_lo, v_hi, out=out)
+        # The fixed source and transfer blocks of s are written once; each call
+        # overwrites only the sink block of this buffer in place.
+        s_out = np.zeros(p)
+        s_out[p1:p2] = L
+        def prox_s(v, t):
+            # Returns s_out itself, not a copy, so the next call overwrites the result;
+            # callers that keep it must copy it. a2dr only uses x^(k+1/2) within one iteration.
+            prox_sat(v[p2:], t, d[p2:], 0, s_max, out=s_out[p2:])
+            return s_out
+        prox_list = [lambda v, t: prox_sat(v, t, c, -z_max, z_max), prox_s]
         A_list = [B, sparse.eye(p)]
         b = np.zeros(p)
         
@@ -395,14 +404,14 @@ class TestPaper(BaseTest):
                             np.maximum(-cvxpy_s[p2:],0),
                             np.maximum(cvxpy_s[p2:]-s_max,0),
                             B.dot(cvxpy_z)+cvxpy_s]
-        cvxpy_constr_vio_val = np.linalg.norm(np.hstack(cvxpy_constr_vio))
+        cvxpy_constr_vio_val = np.sqrt(np.sum([vio.dot(vio) for vio in cvxpy_constr_vio]))
         a2dr_constr_vio = [np.maximum(np.abs(a2dr_z) - z_max, 0), 
                             a2dr_s[:p1], 
                             np.abs(a2dr_s[p1:p2]-L), 
                             np.maximum(-a2dr_s[p2:],0),
                             np.maximum(a2dr_s[p2:]-s_max,0),
                             B.dot(a2dr_z)+a2dr_s]
-        a2dr_constr_vio_val = np.linalg.norm(np.hstack(a2dr_constr_vio))
+        a2dr_constr_vio_val = np.sqrt(np.sum([vio.dot(vio) for vio in a2dr_constr_vio]))
         print('objective cvxpy raw = {}, objective a2dr = {}'.format(cvxpy_obj_raw, a2dr_obj))
         print('constraint violation cvxpy = {}, constraint violation a2dr = {}'.format(
             cvxpy_constr_vio_val, a2dr_constr_vio_val))